@@ -20,14 +20,42 @@
 from __future__ import annotations
 
 import argparse
+import collections
+import functools
 import heapq
+import math
+import mmap
+import multiprocessing
 import os
 import shutil
 import socket
 import tempfile
-from typing import BinaryIO, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+try:
+    import resource  # только POSIX
+except ImportError:
+    resource = None
 
 RECORD_SIZE = 16  # IPv6 занимает ровно 16 байт (128 бит) в packed-форме
+READ_BLOCK_SIZE = 16 * 1024 * 1024  # размер блока при чтении входного текста
+PARSE_WINDOW_LINES = 64 * 1024  # сколько строк разбирается за один вызов parse_block
+MAX_LINE_BYTES = 64  # оценка сверху длины строки: IPv6 в тексте — до 39 символов (+ \r\n, пробелы)
+RUN_WRITE_BUFFER = 4 * 1024 * 1024  # буфер записи run-файла без O_DIRECT
+MERGE_MEMORY = 256 * 1024 * 1024  # суммарный объём буферов чтения/записи при слиянии
+MAX_FAN_IN = 512  # верхняя граница числа одновременно сливаемых runs
+DEFAULT_FAN_IN = 128  # fan-in, если лимит открытых файлов узнать нельзя (не POSIX)
+RESERVED_FDS = 16  # дескрипторы, оставляемые под stdin/stdout/выходной файл и т.п.
+DIRECT_IO_ALIGN = 4096  # выравнивание адреса, смещения и длины для O_DIRECT
+DIRECT_IO_BUFFER = 4 * 1024 * 1024  # буфер записи run-файла в режиме O_DIRECT
+WORKERS_MEMORY = 768 * 1024 * 1024  # бюджет памяти на все процессы генерации runs
+# Память на одну строку чанка в расчёте на воркер: пик самого воркера (~220 байт: текст,
+# packed-адреса, set, sorted, join) + текст задачи, который держит главный процесс (~50 байт).
+# Замерено на 1M уникальных адресов в полной форме (40 байт на строку), с запасом.
+WORKER_BYTES_PER_RECORD = 300
+
+_inet_pton6 = functools.partial(socket.inet_pton, socket.AF_INET6)
 
 
 def ipv6_to_packed(addr: str) -> bytes:
@@ -51,104 +79,602 @@ def ipv6_to_packed(addr: str) -> bytes:
     return socket.inet_pton(socket.AF_INET6, addr)
 
 
-def flush_run(buf: List[bytes], tmp_dir: str, run_idx: int) -> str:
+def parse_block(block: bytes) -> List[bytes]:
+    """
+    Преобразовать блок входного текста (целое число строк) в список packed-IPv6.
+
+    Блок разбивается по пробельным символам одним вызовом `bytes.split()`
+    (это заодно срезает пробелы по краям строк и пропускает пустые строки),
+    а `inet_pton` применяется через `map` — цикл по строкам выполняется
+    на уровне C, без интерпретации Python-кода на каждый адрес.
+
+    Параметры:
+        block: байты входного файла, заканчивающиеся на границе строки.
+
+    Возвращает:
+        Список bytes длины 16 в порядке следования строк.
+    """
+    return list(map(_inet_pton6, block.decode("ascii").split()))
+
+
+def iter_text_blocks(input_path: str, block_size: int = READ_BLOCK_SIZE) -> Iterator[bytes]:
+    """
+    Читать входной файл крупными бинарными блоками, выровненными по концу строки.
+
+    Обычный файл отображается в память (mmap) и режется окнами по block_size байт
+    до последнего перевода строки в окне: нет системных вызовов read() на каждый блок
+    и склейки хвоста с началом следующего блока. Уже отданные окна отпускаются
+    (MADV_DONTNEED + POSIX_FADV_DONTNEED), чтобы прочитанный один раз вход
+    не вытеснял из page cache run-файлы. Пустой файл, канал и прочие файлы,
+    которые нельзя отобразить, читаются через read() (см. _iter_read_blocks).
+
+    Параметры:
+        input_path: путь к входному текстовому файлу.
+        block_size: примерный размер одного блока в байтах.
+
+    Возвращает:
+        Итератор по блокам bytes.
+    """
+    with open(input_path, "rb", buffering=0) as fin:
+        mm = None
+        try:
+            if os.fstat(fin.fileno()).st_size > 0:
+                mm = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            mm = None
+
+        if mm is None:
+            yield from _iter_read_blocks(fin, block_size)
+            return
+        with mm:
+            yield from _iter_mmap_blocks(mm, fin.fileno(), block_size)
+
+
+def _nth_line_end(data: bytes, n: int, lo: int = 0) -> int:
+    """
+    Позиция сразу за n-м (n >= 1) переводом строки в data, начиная с позиции lo.
+    Вызывающий гарантирует, что столько переводов строки в data[lo:] есть.
+
+    Сначала окно [lo, hi) удваивается, пока в нём не наберётся n переводов строки,
+    затем делится пополам по bytes.count: стоимость пропорциональна расстоянию
+    до ответа, а не размеру data, и цикла Python по строкам нет.
+    """
+    hi, step = lo, 64 * n
+    while True:
+        nxt = min(len(data), hi + step)
+        c = data.count(b"\n", hi, nxt)
+        if c >= n:
+            lo, hi = hi, nxt
+            break
+        n -= c
+        hi = nxt
+        step *= 2
+
+    while hi - lo > 256:
+        mid = (lo + hi) // 2
+        c = data.count(b"\n", lo, mid)
+        if c >= n:
+            hi = mid
+        else:
+            n -= c
+            lo = mid
+    for _ in range(n):
+        lo = data.find(b"\n", lo) + 1
+    return lo
+
+
+def iter_line_blocks(
+    input_path: str, max_lines: int, block_size: int = READ_BLOCK_SIZE
+) -> Iterator[bytes]:
+    """
+    Читать входной файл кусками текста ровно по max_lines строк (последний — не больше).
+
+    Блоки iter_text_blocks режутся на max_lines-м переводе строки (см. _nth_line_end),
+    остаток переносится в следующий кусок. Так объём одновременно разбираемого текста
+    ограничен числом строк, а не только байтами блока: на коротких строках
+    (например, "::1") 16 МиБ — это миллионы строк.
+
+    Параметры:
+        input_path: путь к входному текстовому файлу.
+        max_lines: максимальное число строк в куске (>= 1).
+        block_size: размер блока чтения в байтах.
+
+    Возвращает:
+        Итератор по кускам bytes, заканчивающимся на границе строки.
+    """
+    parts: List[bytes] = []
+    lines = 0
+    for block in iter_text_blocks(input_path, block_size):
+        start = 0
+        left = block.count(b"\n")
+        while lines + left >= max_lines:
+            need = max_lines - lines
+            cut = _nth_line_end(block, need, start)
+            parts.append(block[start:cut])
+            yield b"".join(parts) if len(parts) > 1 else parts[0]
+            parts = []
+            lines = 0
+            left -= need
+            start = cut
+        if start < len(block):
+            parts.append(block[start:] if start else block)
+            lines += left
+    if parts:
+        yield b"".join(parts)
+
+
+def _iter_read_blocks(fin: BinaryIO, block_size: int) -> Iterator[bytes]:
+    """
+    Блоки через read(): хвост блока после последнего перевода строки переносится
+    в начало следующего блока, поэтому ни одна строка не разрезается между блоками.
+    """
+    tail = b""
+    while True:
+        chunk = fin.read(block_size)
+        if not chunk:
+            break
+        data = tail + chunk if tail else chunk
+        cut = data.rfind(b"\n") + 1
+        if cut == 0:
+            tail = data
+            continue
+        tail = data[cut:]
+        yield data[:cut]
+    if tail:
+        yield tail
+
+
+def _iter_mmap_blocks(mm: mmap.mmap, fd: int, block_size: int) -> Iterator[bytes]:
+    """Блоки из отображённого файла: окно режется по последнему переводу строки в нём."""
+    size = len(mm)
+    if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+
+    off = released = 0
+    while off < size:
+        end = min(off + block_size, size)
+        cut = end if end == size else mm.rfind(b"\n", off, end) + 1
+        if cut <= off:  # строка длиннее окна — берём её целиком
+            nl = mm.find(b"\n", end)
+            cut = size if nl < 0 else nl + 1
+        yield mm[off:cut]
+        off = cut
+
+        done = off - off % mmap.PAGESIZE
+        if done > released:
+            _drop_pages(mm, fd, released, done - released)
+            released = done
+
+
+def _drop_pages(mm: mmap.mmap, fd: int, start: int, length: int) -> None:
+    """Отпустить уже прочитанный диапазон входа: из отображения и из page cache."""
+    if hasattr(mm, "madvise") and hasattr(mmap, "MADV_DONTNEED"):
+        mm.madvise(mmap.MADV_DONTNEED, start, length)
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, start, length, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+
+def _align_up(n: int) -> int:
+    """Округлить n вверх до кратного DIRECT_IO_ALIGN."""
+    return -(-n // DIRECT_IO_ALIGN) * DIRECT_IO_ALIGN
+
+
+class DirectRunWriter:
+    """
+    Запись run-файла в обход page cache (O_DIRECT).
+
+    Run-файлы читаются ровно один раз, поэтому держать их в page cache бессмысленно:
+    они лишь вытесняют полезные данные. O_DIRECT требует выровненных адреса буфера,
+    смещения и длины записи, поэтому данные копируются в буфер из mmap (он выровнен
+    по странице) и пишутся блоками, кратными DIRECT_IO_ALIGN. Хвост дополняется нулями
+    до границы блока, а затем файл обрезается до истинной длины через ftruncate.
+
+    Интерфейс (write/close/контекстный менеджер) совпадает с обычным файлом.
+    """
+
+    def __init__(self, path: str, bufsize: int = DIRECT_IO_BUFFER) -> None:
+        self._size = _align_up(max(bufsize, DIRECT_IO_ALIGN))
+        self._buf = mmap.mmap(-1, self._size)
+        self._pos = 0
+        self._total = 0
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT |
+                           os.O_TRUNC | os.O_DIRECT, 0o644)
+
+    def write(self, data: bytes) -> None:
+        """Дописать данные в буфер, сбрасывая его на диск по заполнении."""
+        mv = memoryview(data)
+        while mv:
+            n = min(len(mv), self._size - self._pos)
+            self._buf[self._pos: self._pos + n] = mv[:n]
+            self._pos += n
+            mv = mv[n:]
+            if self._pos == self._size:
+                self._flush(self._size)
+
+    def _flush(self, length: int) -> None:
+        view = memoryview(self._buf)[:length]
+        try:
+            written = 0
+            while written < length:
+                written += os.write(self._fd, view[written:])
+        finally:
+            view.release()
+        self._total += self._pos
+        self._pos = 0
+
+    def close(self) -> None:
+        """Записать хвост (с выравниванием), обрезать файл до истинной длины и закрыть его."""
+        if self._fd < 0:
+            return
+        try:
+            if self._pos:
+                padded = _align_up(self._pos)
+                self._buf[self._pos: padded] = bytes(padded - self._pos)
+                self._flush(padded)
+            os.ftruncate(self._fd, self._total)
+        finally:
+            os.close(self._fd)
+            self._fd = -1
+            self._buf.close()
+
+    def __enter__(self) -> "DirectRunWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class DirectRunReader:
+    """
+    Чтение run-файла в обход page cache (O_DIRECT), пара к DirectRunWriter.
+
+    Файл читается блоками размера, кратного DIRECT_IO_ALIGN, в выровненный буфер
+    из mmap; read(n) отдаёт записи из последнего прочитанного блока.
+    """
+
+    def __init__(self, path: str, bufsize: int) -> None:
+        self._buf = mmap.mmap(-1, _align_up(max(bufsize, DIRECT_IO_ALIGN)))
+        self._data = b""
+        self._pos = 0
+        self._fd = os.open(path, os.O_RDONLY | os.O_DIRECT)
+
+    def read(self, n: int) -> bytes:
+        """Прочитать n байт (n делит размер буфера; в runs это RECORD_SIZE)."""
+        pos = self._pos
+        if pos >= len(self._data):
+            got = os.readv(self._fd, [self._buf])
+            self._data = self._buf[:got]
+            pos = 0
+        self._pos = pos + n
+        return self._data[pos: pos + n]
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def close(self) -> None:
+        if self._fd < 0:
+            return
+        os.close(self._fd)
+        self._fd = -1
+        self._buf.close()
+
+
+def _open_run_writer(path: str, buffering: int, direct_io: bool):
+    """Открыть run-файл на запись: буферизованный файл или DirectRunWriter."""
+    if direct_io:
+        return DirectRunWriter(path, buffering)
+    return open(path, "wb", buffering=buffering)
+
+
+def flush_run(buf: List[bytes], tmp_dir: str, run_idx: int, direct_io: bool = False) -> str:
     """
     Отсортировать буфер packed-IPv6 (по 16 байт) и записать его в бинарный run-файл.
 
-    Run-файл представляет собой последовательность записей фиксированной длины 16 байт:
+    Повторы внутри буфера отбрасываются ещё до сортировки (через set): для подсчёта
+    уникальных они не нужны, а сортировать и сливать приходится меньше записей.
+
+    Run-файл представляет собой последовательность записей фиксированной длины 16 байт
+    без повторов:
         [rec0][rec1][rec2]...
 
     Параметры:
         buf: список packed-адресов (bytes по 16 байт).
         tmp_dir: директория для временных файлов.
         run_idx: индекс (для уникального имени файла).
+        direct_io: писать в обход page cache (см. DirectRunWriter).
 
     Возвращает:
         Путь к созданному run-файлу.
     """
-    buf.sort()
+    recs = sorted(set(buf))
     path = os.path.join(tmp_dir, f"run_{run_idx:06d}.bin")
-    with open(path, "wb", buffering=1024 * 1024) as f:
-        for rec in buf:
-            f.write(rec)
+    # BufferedWriter (как и DirectRunWriter) дописывает данные до конца даже при частичной записи.
+    bufsize = DIRECT_IO_BUFFER if direct_io else RUN_WRITE_BUFFER
+    with _open_run_writer(path, bufsize, direct_io) as f:
+        f.write(b"".join(recs))
     return path
 
 
-def generate_initial_runs(input_path: str, tmp_dir: str, chunk_records: int) -> List[str]:
+def auto_workers(chunk_records: int) -> int:
+    """
+    Подобрать число процессов для генерации runs.
+
+    Не больше числа CPU и не больше, чем помещается в WORKERS_MEMORY при пиковом
+    потреблении ~WORKER_BYTES_PER_RECORD байт на строку чанка в расчёте на воркер.
+    Оценка опирается на то, что чанк — ровно chunk_records строк (см. iter_chunk_texts).
+    """
+    by_memory = WORKERS_MEMORY // max(1, chunk_records * WORKER_BYTES_PER_RECORD)
+    return max(1, min(os.cpu_count() or 1, by_memory))
+
+
+def iter_chunk_texts(input_path: str, chunk_records: int) -> Iterator[bytes]:
+    """
+    Нарезать входной файл на куски текста ровно по chunk_records строк
+    (последний кусок — не больше), см. iter_line_blocks. Адреса не разбираются:
+    главный процесс только режет текст, разбор идёт в воркерах.
+    """
+    return iter_line_blocks(input_path, chunk_records)
+
+
+def _run_from_text(text: bytes, tmp_dir: str, run_idx: int, direct_io: bool) -> str:
+    """
+    Задача воркера: разобрать кусок текста, отсортировать и записать его как один run.
+
+    Текст разбирается окнами по PARSE_WINDOW_LINES строк: промежуточные str на весь
+    кусок сразу не создаются, в памяти воркера — сам кусок и его packed-адреса.
+    """
+    buf: List[bytes] = []
+    start, left = 0, text.count(b"\n")
+    while left > PARSE_WINDOW_LINES:
+        cut = _nth_line_end(text, PARSE_WINDOW_LINES, start)
+        buf.extend(parse_block(text[start:cut]))
+        start = cut
+        left -= PARSE_WINDOW_LINES
+    buf.extend(parse_block(text[start:]))
+    return flush_run(buf, tmp_dir, run_idx, direct_io)
+
+
+def generate_initial_runs(
+    input_path: str,
+    tmp_dir: str,
+    chunk_records: int,
+    direct_io: bool = False,
+    workers: int = 1,
+) -> List[str]:
     """
     Прочитать входной текстовый файл и сформировать начальные отсортированные runs на диске.
 
     Алгоритм:
-    - потоково читаем строки;
-    - переводим IPv6 в packed-вид (16 байт);
+    - потоково читаем файл кусками не больше min(chunk_records, PARSE_WINDOW_LINES)
+      строк (см. iter_line_blocks), так что память разбора ограничена chunk_records;
+    - переводим все IPv6 куска в packed-вид (16 байт) пакетно (см. parse_block);
     - накапливаем chunk_records записей в памяти;
     - сортируем и записываем run-файл.
 
+    При workers > 1 разбор, сортировка и запись выполняются параллельно в отдельных
+    процессах: главный процесс только нарезает файл на куски (см. iter_chunk_texts)
+    и раздаёт их воркерам, номера runs назначает он же. Одновременно в работе
+    не больше workers кусков, чтобы память оставалась ограниченной.
+
     Параметры:
         input_path: путь к входному текстовому файлу.
         tmp_dir: директория для временных файлов.
         chunk_records: сколько IPv6 хранить в памяти перед сбросом на диск.
+        direct_io: писать runs в обход page cache (см. DirectRunWriter).
+        workers: число процессов (1 — всё в текущем процессе).
 
     Возвращает:
         Список путей к run-файлам (каждый run уже отсортирован).
     """
+    if workers > 1:
+        return _generate_initial_runs_parallel(
+            input_path, tmp_dir, chunk_records, direct_io, workers)
+
     runs: List[str] = []
     buf: List[bytes] = []
     run_idx = 0
 
-    with open(input_path, "r", encoding="ascii", errors="strict", newline="") as fin:
-        for line in fin:
-            s = line.strip()
-            if not s:
-                # По условию пустых строк нет, но оставим защиту.
-                continue
+    window = min(chunk_records, PARSE_WINDOW_LINES)
+    for block in iter_line_blocks(input_path, window, min(READ_BLOCK_SIZE, window * MAX_LINE_BYTES)):
+        buf.extend(parse_block(block))
 
-            buf.append(ipv6_to_packed(s))
-
-            if len(buf) >= chunk_records:
-                runs.append(flush_run(buf, tmp_dir, run_idx))
-                run_idx += 1
-                buf.clear()
+        while len(buf) >= chunk_records:
+            runs.append(flush_run(
+                buf[:chunk_records], tmp_dir, run_idx, direct_io))
+            run_idx += 1
+            del buf[:chunk_records]
 
     if buf:
-        runs.append(flush_run(buf, tmp_dir, run_idx))
+        runs.append(flush_run(buf, tmp_dir, run_idx, direct_io))
         buf.clear()
 
     return runs
 
 
-def _open_runs(run_paths: List[str]) -> List[BinaryIO]:
-    """Открыть run-файлы для бинарного чтения с увеличенным буфером."""
+def _generate_initial_runs_parallel(
+    input_path: str, tmp_dir: str, chunk_records: int, direct_io: bool, workers: int
+) -> List[str]:
+    """Параллельная версия generate_initial_runs на пуле процессов (контекст spawn)."""
+    runs: List[str] = []
+    pending: collections.deque = collections.deque()
+    ctx = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        for run_idx, text in enumerate(iter_chunk_texts(input_path, chunk_records)):
+            pending.append(pool.submit(
+                _run_from_text, text, tmp_dir, run_idx, direct_io))
+            del text
+            if len(pending) >= workers:
+                runs.append(pending.popleft().result())
+        while pending:
+            runs.append(pending.popleft().result())
+
+    return runs
+
+
+def auto_fan_in() -> int:
+    """
+    Подобрать fan-in по лимиту открытых файлов ОС.
+
+    Если мягкий лимит RLIMIT_NOFILE меньше MAX_FAN_IN + RESERVED_FDS, он поднимается
+    до этого значения, но не выше жёсткого (это разрешено без прав администратора),
+    после чего fan-in = min(лимит - RESERVED_FDS, MAX_FAN_IN).
+    Чем больше fan-in, тем меньше уровней слияния: при fan-in в сотни файлов
+    даже миллиард адресов обычно сливается за один проход.
+
+    Возвращает:
+        Максимальное число runs, которые можно сливать одновременно.
+    """
+    if resource is None:
+        return DEFAULT_FAN_IN
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = MAX_FAN_IN + RESERVED_FDS
+    if hard != resource.RLIM_INFINITY:
+        target = min(target, hard)
+    if soft == resource.RLIM_INFINITY or soft >= target:
+        return MAX_FAN_IN
+
+    try:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        soft = target
+    except (ValueError, OSError):
+        pass
+    return max(2, min(soft - RESERVED_FDS, MAX_FAN_IN))
+
+
+def merge_buffer_sizes(k: int, memory: int = MERGE_MEMORY) -> Tuple[int, int]:
+    """
+    Разделить память слияния между k входными буферами и одним выходным.
+
+    Используется соотношение R_in : R_out = sqrt(k) : 1 (суммарно по всем входам),
+    минимизирующее число раундов обмена с диском при k-way merge:
+        R_in  = M * sqrt(k) / (sqrt(k) + 1) / k   (на каждый входной файл),
+        R_out = M / (sqrt(k) + 1).
+
+    Параметры:
+        k: число сливаемых runs.
+        memory: общий бюджет памяти под буферы (байт).
+
+    Возвращает:
+        (размер буфера одного входного файла, размер выходного буфера), оба кратны RECORD_SIZE.
+    """
+    k = max(1, k)
+    root = math.sqrt(k)
+    r_in = int(memory * root / (root + 1) / k)
+    r_out = int(memory / (root + 1))
+    r_in = max(RECORD_SIZE * 1024, r_in - r_in % RECORD_SIZE)
+    r_out = max(RECORD_SIZE * 1024, r_out - r_out % RECORD_SIZE)
+    return r_in, r_out
+
+
+def _advise_sequential(f: BinaryIO, prefetch: int) -> None:
+    """
+    Подсказать ядру, что run-файл будет читаться последовательно, и заранее
+    запросить чтение его первых prefetch байт (POSIX_FADV_WILLNEED).
+
+    WILLNEED не блокирует: запросы на чтение начала всех k файлов уходят в очередь
+    устройства сразу при открытии, а не по одному по мере первых обращений слияния.
+    Дальше ядро само ведёт асинхронное опережающее чтение, окно которого после
+    POSIX_FADV_SEQUENTIAL увеличено. Вне Linux/POSIX функция ничего не делает.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = f.fileno()
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        os.posix_fadvise(fd, 0, prefetch, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+
+
+def _open_runs(run_paths: List[str], buffering: int, direct_io: bool = False) -> List[BinaryIO]:
+    """
+    Открыть run-файлы для бинарного чтения с буфером заданного размера.
+
+    Буфер не делается больше самого файла: для мелких runs это экономит память.
+    Для каждого файла сразу запрашивается опережающее чтение двух буферов
+    (текущего и следующего), см. _advise_sequential. При direct_io файлы читаются
+    через DirectRunReader, и подсказки page cache не нужны.
+    """
     files: List[BinaryIO] = []
     for p in run_paths:
-        files.append(open(p, "rb", buffering=1024 * 1024))
+        size = max(os.path.getsize(p), RECORD_SIZE)
+        if direct_io:
+            files.append(DirectRunReader(p, min(buffering, size)))
+            continue
+        f = open(p, "rb", buffering=min(buffering, size))
+        files.append(f)
+        _advise_sequential(f, 2 * buffering)
     return files
 
 
-def merge_runs_to_file(run_paths: List[str], out_path: str) -> None:
+def _merge_records(files: List[BinaryIO]) -> Iterator[bytes]:
+    """
+    k-way merge отсортированных run-файлов: выдаёт записи всех файлов по возрастанию.
+
+    Узлы кучи — изменяемые списки [запись, индекс файла, read файла], которые живут
+    всё время слияния: у победителя подменяется запись и вызывается heapreplace. Так
+    на каждую выданную запись приходится одно просеивание вниз (как в дереве турнира)
+    вместо пары heappop + heappush, и не создаётся новый кортеж.
+
+    Записи читаются по RECORD_SIZE байт из буферизованных файлов (см. _open_runs):
+    системный вызов выполняется только при опустошении буфера, а сам read(16) — это
+    вызов C-метода, который дешевле любого буфера, разбираемого Python-кодом.
+    Метод read привязан к узлу заранее, чтобы не искать его на каждой записи.
+
+    Параметры:
+        files: открытые на чтение отсортированные run-файлы.
+
+    Возвращает:
+        Итератор по записям (bytes длины RECORD_SIZE) в отсортированном порядке.
+    """
+    heap: List[List] = []
+    for i, f in enumerate(files):
+        rec = f.read(RECORD_SIZE)
+        if rec:
+            # При равных записях сравнение дойдёт до уникального индекса, но не до read.
+            heap.append([rec, i, f.read])
+    heapq.heapify(heap)
+
+    replace = heapq.heapreplace
+    while heap:
+        top = heap[0]
+        yield top[0]
+        nxt = top[2](RECORD_SIZE)
+        if nxt:
+            top[0] = nxt
+            replace(heap, top)
+        else:
+            heapq.heappop(heap)
+
+
+def merge_runs_to_file(run_paths: List[str], out_path: str, direct_io: bool = False) -> None:
     """
     Слить несколько отсортированных run-файлов в один отсортированный run-файл (k-way merge).
 
+    Повторы между сливаемыми runs в выходной файл не пишутся: для подсчёта уникальных
+    они не нужны, а следующему проходу достаётся меньше данных.
+
     Параметры:
         run_paths: пути к входным отсортированным runs.
         out_path: путь к выходному run-файлу.
+        direct_io: читать и писать в обход page cache (O_DIRECT).
     """
-    files = _open_runs(run_paths)
+    r_in, r_out = merge_buffer_sizes(len(run_paths))
+    r_out = min(r_out, max(sum(os.path.getsize(p) for p in run_paths), RECORD_SIZE))
+    files = _open_runs(run_paths, r_in, direct_io)
     try:
-        heap: List[Tuple[bytes, int]] = []
-        for i, f in enumerate(files):
-            rec = f.read(RECORD_SIZE)
-            if rec:
-                heap.append((rec, i))
-        heapq.heapify(heap)
-
-        with open(out_path, "wb", buffering=1024 * 1024) as out:
-            while heap:
-                rec, i = heapq.heappop(heap)
-                out.write(rec)
-                nxt = files[i].read(RECORD_SIZE)
-                if nxt:
-                    heapq.heappush(heap, (nxt, i))
+        with _open_run_writer(out_path, r_out, direct_io) as out:
+            write = out.write
+            prev: Optional[bytes] = None
+            for rec in _merge_records(files):
+                if rec != prev:
+                    write(rec)
+                    prev = rec
     finally:
         for f in files:
             try:
@@ -157,55 +683,61 @@ def merge_runs_to_file(run_paths: List[str], out_path: str) -> None:
                 pass
 
 
-def reduce_runs(run_paths: List[str], tmp_dir: str, fan_in: int) -> List[str]:
+def reduce_runs(
+    run_paths: List[str], tmp_dir: str, fan_in: int, direct_io: bool = False
+) -> List[str]:
     """
     Уменьшить количество run-файлов многоступенчатым слиянием партиями.
 
     Это нужно, потому что нельзя открыть слишком много файлов одновременно
     (лимит файловых дескрипторов ОС).
 
+    Сливается ровно столько, сколько нужно, чтобы осталось fan_in runs: каждое
+    слияние k файлов уменьшает их число на k - 1, поэтому партия берётся размером
+    min(fan_in, лишние + 1), и в неё идут самые маленькие runs. Последний уровень
+    в файл не пишется — оставшиеся runs сразу читает count_unique_across_runs.
+
     Параметры:
         run_paths: список текущих runs.
         tmp_dir: директория для временных файлов.
         fan_in: максимальное число runs, сливаемых за один проход.
+        direct_io: читать и писать runs в обход page cache (O_DIRECT).
 
     Возвращает:
         Новый список runs, размер которого <= fan_in.
     """
-    level = 0
-    runs = run_paths[:]
-
-    while len(runs) > fan_in:
-        new_runs: List[str] = []
-
-        for batch_start in range(0, len(runs), fan_in):
-            batch = runs[batch_start: batch_start + fan_in]
-            merged_path = os.path.join(
-                tmp_dir, f"merge_{level:03d}_{batch_start // fan_in:06d}.bin")
-
-            merge_runs_to_file(batch, merged_path)
-            new_runs.append(merged_path)
-
-            # Удаляем старые файлы партии, чтобы освобождать место на диске.
-            for p in batch:
-                try:
-                    os.remove(p)
-                except FileNotFoundError:
-                    pass
+    fan_in = max(2, fan_in)
+    heap = [(os.path.getsize(p), p) for p in run_paths]
+    heapq.heapify(heap)
+    merge_idx = 0
+
+    while len(heap) > fan_in:
+        k = min(fan_in, len(heap) - fan_in + 1)
+        batch = [heapq.heappop(heap)[1] for _ in range(k)]
+        merged_path = os.path.join(tmp_dir, f"merge_{merge_idx:06d}.bin")
+
+        merge_runs_to_file(batch, merged_path, direct_io)
+        heapq.heappush(heap, (os.path.getsize(merged_path), merged_path))
+        merge_idx += 1
+
+        # Удаляем старые файлы партии, чтобы освобождать место на диске.
+        for p in batch:
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
 
-        runs = new_runs
-        level += 1
+    return [p for _, p in heap]
 
-    return runs
 
-
-def count_unique_across_runs(run_paths: List[str]) -> int:
+def count_unique_across_runs(run_paths: List[str], direct_io: bool = False) -> int:
     """
     Подсчитать количество уникальных IPv6-адресов по нескольким отсортированным runs,
     выполняя k-way merge и сравнивая текущую запись с предыдущей.
 
     Параметры:
         run_paths: список путей к отсортированным run-файлам.
+        direct_io: читать runs в обход page cache (O_DIRECT).
 
     Возвращает:
         Количество уникальных адресов.
@@ -213,28 +745,18 @@ def count_unique_across_runs(run_paths: List[str]) -> int:
     if not run_paths:
         return 0
 
-    files = _open_runs(run_paths)
+    # Выходного файла нет, поэтому вся память слияния делится между входами.
+    buffering = MERGE_MEMORY // len(run_paths)
+    files = _open_runs(run_paths, buffering - buffering % RECORD_SIZE, direct_io)
     try:
-        heap: List[Tuple[bytes, int]] = []
-        for i, f in enumerate(files):
-            rec = f.read(RECORD_SIZE)
-            if rec:
-                heap.append((rec, i))
-        heapq.heapify(heap)
-
         prev: Optional[bytes] = None
         uniq = 0
 
-        while heap:
-            rec, i = heapq.heappop(heap)
+        for rec in _merge_records(files):
             if prev != rec:
                 uniq += 1
                 prev = rec
 
-            nxt = files[i].read(RECORD_SIZE)
-            if nxt:
-                heapq.heappush(heap, (nxt, i))
-
         return uniq
     finally:
         for f in files:
@@ -248,8 +770,10 @@ def count_unique_ipv6_external(
     input_path: str,
     output_path: str,
     chunk_records: int = 1_000_000,
-    fan_in: int = 128,
+    fan_in: Optional[int] = None,
     keep_tmp: bool = False,
+    direct_io: bool = False,
+    workers: Optional[int] = None,
 ) -> int:
     """
     Основная функция решения: внешняя сортировка + подсчёт уникальных.
@@ -258,17 +782,30 @@ def count_unique_ipv6_external(
         input_path: путь к входному текстовому файлу (IPv6 по одному в строке).
         output_path: путь к выходному файлу (одно целое число).
         chunk_records: размер чанка (сколько адресов держим в RAM перед сортировкой и сбросом в run).
-        fan_in: максимум файлов, которые сливаем/открываем одновременно.
+        fan_in: максимум файлов, которые сливаем/открываем одновременно
+            (None — подобрать по лимиту открытых файлов ОС, см. auto_fan_in).
         keep_tmp: сохранять ли временную директорию (для отладки).
+        direct_io: писать и читать runs с O_DIRECT, в обход page cache
+            (только Linux; tmpfs O_DIRECT не поддерживает).
+        workers: число процессов для генерации runs
+            (None — подобрать по числу CPU и памяти, см. auto_workers).
 
     Возвращает:
         Количество уникальных IPv6-адресов.
     """
+    if direct_io and not hasattr(os, "O_DIRECT"):
+        raise ValueError("O_DIRECT не поддерживается на этой платформе")
+    if fan_in is None:
+        fan_in = auto_fan_in()
+    if workers is None:
+        workers = auto_workers(chunk_records)
+
     tmp_dir = tempfile.mkdtemp(prefix="ipv6_uniq_")
     try:
-        runs = generate_initial_runs(input_path, tmp_dir, chunk_records)
-        runs = reduce_runs(runs, tmp_dir, fan_in)
-        ans = count_unique_across_runs(runs)
+        runs = generate_initial_runs(
+            input_path, tmp_dir, chunk_records, direct_io, workers)
+        runs = reduce_runs(runs, tmp_dir, fan_in, direct_io)
+        ans = count_unique_across_runs(runs, direct_io)
 
         with open(output_path, "w", encoding="utf-8", newline="\n") as fout:
             fout.write(str(ans))
@@ -289,6 +826,10 @@ def parse_args() -> argparse.Namespace:
     По требованию — два позиционных аргумента:
         1) входной файл
         2) выходной файл
+
+    Необязательные флаги:
+        --direct-io — O_DIRECT для временных run-файлов;
+        --workers N — число процессов для генерации runs.
     """
     p = argparse.ArgumentParser(
         description="Подсчёт уникальных IPv6-адресов в большом файле"
@@ -297,13 +838,21 @@ def parse_args() -> argparse.Namespace:
         "input_path", help="Путь к входному текстовому файлу (IPv6 по одному в строке).")
     p.add_argument(
         "output_path", help="Путь к выходному файлу (одно целое число).")
+    p.add_argument(
+        "--direct-io", action="store_true",
+        help="Писать/читать временные runs с O_DIRECT в обход page cache (Linux, не tmpfs).")
+    p.add_argument(
+        "--workers", type=int, default=None,
+        help="Число процессов для генерации runs (по умолчанию — по числу CPU и памяти).")
     return p.parse_args()
 
 
 def main() -> None:
     """Точка входа"""
     args = parse_args()
-    count_unique_ipv6_external(args.input_path, args.output_path)
+    count_unique_ipv6_external(
+        args.input_path, args.output_path,
+        direct_io=args.direct_io, workers=args.workers)
 
 
 if __name__ == "__main__":
@@ -2,10 +2,11 @@ import os
 import cv2
 import numpy as np
 from src.features.sky_mask import sky_mask
-from src.features.exg_gradmag import exg, gradmag
+from src.features.exg_gradmag import precompute_features
 from src.features.fol_ground import foliage_mask_autumn, ground_warm_mask_autumn, foliage_mask_summer, ground_grass_mask_summer
 from src.features.trunk_mask import trunk_mask
-from src.features.protect_bright import protect_bright, feather_alpha_sky
+from src.features.pyramid import upsample_alpha, upsample_mask
+from src.features.protect_bright import bright_mask, feather_alpha_sky
 from src.features.recoloring import recolor_hsv_region, map_green_to_autumn, blend, degreen_trunks
 
 PHOTO1_PATH = "data/task-2/Photo1.jpg"  # осень
@@ -20,35 +21,42 @@ def process_images(photo1_path: str = PHOTO1_PATH, photo2_path: str = PHOTO2_PAT
     p1 = cv2.imread(photo1_path, cv2.IMREAD_COLOR)  # осень
     p2 = cv2.imread(photo2_path, cv2.IMREAD_COLOR)  # лето
 
-    sky1 = sky_mask(p1)
-    sky2 = sky_mask(p2)
+    # Маски строятся на половинном разрешении (pyrDown): морфология, заливка и
+    # компоненты там в ~4 раза дешевле; ядра и пороги площади пересчитываются через scale.
+    # Перекраска и blend остаются на полном разрешении.
+    p1h = cv2.pyrDown(p1)
+    p2h = cv2.pyrDown(p2)
 
-    g1 = exg(p1)
-    g2 = exg(p2)
+    # HSV полного кадра — один раз на изображение: небо, яркие “дыры” и перекраска
+    hsv1 = cv2.cvtColor(p1, cv2.COLOR_BGR2HSV)
+    hsv2 = cv2.cvtColor(p2, cv2.COLOR_BGR2HSV)
 
-    gray1 = cv2.cvtColor(p1, cv2.COLOR_BGR2GRAY).astype(np.float32)
-    gray2 = cv2.cvtColor(p2, cv2.COLOR_BGR2GRAY).astype(np.float32)
+    # HSV, ExG и градиент половинного кадра — один раз, общие для всех масок
+    hsv1h, g1h, gm1h = precompute_features(p1h)
+    hsv2h, g2h, gm2h = precompute_features(p2h)
 
-    gm1 = gradmag(gray1)
-    gm2 = gradmag(gray2)
+    sky1 = sky_mask(p1, hsv=hsv1)
+    sky1h = sky_mask(p1h, hsv=hsv1h)
+    sky2h = sky_mask(p2h, hsv=hsv2h)
 
-    tr1 = trunk_mask(p1, sky1)
-    tr2 = trunk_mask(p2, sky2)
+    tr1h = trunk_mask(p1h, sky1h, hsv=hsv1h, gmag_sq=gm1h, scale=0.5)
+    tr2h = trunk_mask(p2h, sky2h, hsv=hsv2h, gmag_sq=gm2h, scale=0.5)
 
-    fol1 = foliage_mask_autumn(p1, sky1, tr1)
-    gnd1 = ground_warm_mask_autumn(p1, sky1, tr1)
+    fol1h = foliage_mask_autumn(p1h, sky1h, tr1h, hsv=hsv1h, g=g1h, gmag_sq=gm1h, scale=0.5)
+    gnd1h = ground_warm_mask_autumn(p1h, sky1h, tr1h, hsv=hsv1h, g=g1h, scale=0.5)
 
-    fol2 = foliage_mask_summer(p2, sky2, tr2)
-    gnd2 = ground_grass_mask_summer(p2, sky2, tr2)
+    fol2h = foliage_mask_summer(p2h, sky2h, tr2h, hsv=hsv2h, g=g2h, gmag_sq=gm2h, scale=0.5)
+    gnd2h = ground_grass_mask_summer(p2h, sky2h, tr2h, hsv=hsv2h, g=g2h, scale=0.5)
 
-    alpha_summer = np.zeros(p1.shape[:2], dtype=np.float32)
-    alpha_summer[sky1] = 0.0
-    a_t2 = np.clip(cv2.GaussianBlur(
-        (tr2 > 0).astype(np.float32), (19, 19), 0), 0.0, 1.0)
-    a_t2[sky2] = 0.0
-    a_t2 = protect_bright(a_t2, p2)  # доп. защита ярких облаков
+    fol1 = upsample_mask(fol1h, p1.shape)
+    gnd1 = upsample_mask(gnd1h, p1.shape)
+    fol2 = upsample_mask(fol2h, p2.shape)
+    gnd2 = upsample_mask(gnd2h, p2.shape)
+    tr2 = upsample_mask(tr2h, p2.shape)
 
-    alpha_autumn = np.clip(a_t2, 0.0, 1.0)
+    # где альфа обнуляется: небо + яркие “дыры” неба/облака (раньше — protect_bright на каждую альфу)
+    hold1 = sky1 | bright_mask(p1, hsv=hsv1)
+    hold1h = sky1h | bright_mask(p1h, hsv=hsv1h)
 
     step = p1.copy()
 
@@ -59,6 +67,8 @@ def process_images(photo1_path: str = PHOTO1_PATH, photo2_path: str = PHOTO2_PAT
         sv_strength=0.85,
         clamp_s=(15, 220),
         clamp_v=(10, 240),
+        src_hsv=hsv1,
+        ref_hsv=hsv2,
     )
 
     # 2) земля -> трава
@@ -68,14 +78,14 @@ def process_images(photo1_path: str = PHOTO1_PATH, photo2_path: str = PHOTO2_PAT
         sv_strength=0.90,
         clamp_s=(10, 200),
         clamp_v=(10, 245),
+        ref_hsv=hsv2,
     )
 
-    # 3) альфа
-    a_f = protect_bright(feather_alpha_sky(
-        fol1, sky1, radius=27, erode_px=4), p1)
-    a_g = protect_bright(feather_alpha_sky(
-        gnd1, sky1, radius=31, erode_px=6), p1)
-    alpha_summer = np.clip(a_f + a_g * 0.95, 0.0, 1.0)
+    # 3) альфа (на половинном разрешении: радиусы и erode вдвое меньше)
+    a_f = feather_alpha_sky(fol1h, hold1h, radius=13, erode_px=2)
+    a_g = feather_alpha_sky(gnd1h, hold1h, radius=15, erode_px=3)
+    alpha_summer = upsample_alpha(np.clip(a_f + a_g * 0.95, 0.0, 1.0), p1.shape)
+    alpha_summer[hold1] = 0.0
 
     # 4) финальный blend
     summer_img = blend(p1, step2, alpha_summer)
@@ -84,26 +94,17 @@ def process_images(photo1_path: str = PHOTO1_PATH, photo2_path: str = PHOTO2_PAT
 
     # 1) крона: зелёный -> осень
     stepA1 = map_green_to_autumn(
-        stepA, fol2, p1, fol1, out_range=(10.0, 32.0), sv_strength=0.85)
+        stepA, fol2, p1, fol1, out_range=(10.0, 32.0), sv_strength=0.85,
+        src_hsv=hsv2, ref_hsv=hsv1)
 
     # 2) земля/трава: зелёный -> осень
     stepA2 = map_green_to_autumn(
-        stepA1, gnd2, p1, gnd1, out_range=(12.0, 30.0), sv_strength=0.85)
+        stepA1, gnd2, p1, gnd1, out_range=(12.0, 30.0), sv_strength=0.85,
+        ref_hsv=hsv1)
 
     # 3) стволы
     autumn_img = degreen_trunks(stepA2, tr2, warmth=0.55)
 
-    # 4) альфа
-    a_f2 = protect_bright(feather_alpha_sky(
-        fol2, sky2, radius=25, erode_px=2), p2)
-    a_g2 = protect_bright(feather_alpha_sky(
-        gnd2, sky2, radius=29, erode_px=3), p2)
-    a_t2 = np.clip(cv2.GaussianBlur(
-        (tr2 > 0).astype(np.float32), (19, 19), 0), 0.0, 1.0)
-    a_t2[sky2] = 0.0
-
-    alpha_autumn = np.clip(a_f2 + a_g2 * 0.95 + a_t2, 0.0, 1.0)
-
     cv2.imwrite(OUT_SUMMER, summer_img, [int(cv2.IMWRITE_JPEG_QUALITY), 95])
     cv2.imwrite(OUT_AUTUMN, autumn_img, [int(cv2.IMWRITE_JPEG_QUALITY), 95])
 
@@ -42,3 +42,49 @@ def gradmag(gray_f32: np.ndarray) -> np.ndarray:
     gx = cv2.Sobel(gray_f32, cv2.CV_32F, 1, 0, ksize=3)
     gy = cv2.Sobel(gray_f32, cv2.CV_32F, 0, 1, ksize=3)
     return cv2.magnitude(gx, gy)
+
+
+def gradmag_sq(gray_f32: np.ndarray) -> np.ndarray:
+    """
+    Вычисляет квадрат модуля градиента (Sobel): gx^2 + gy^2.
+    Маски сравнивают модуль градиента только с порогом, а `gmag > thr`
+    равносильно `gmag_sq > thr * thr`, поэтому корень не нужен.
+    Квадраты считаются in-place в буферах gx, gy — без третьего массива H×W.
+
+    Parameters
+    ----------
+    gray_f32 : np.ndarray
+        Одноканальное изображение (H, W)
+
+    Returns
+    -------
+    np.ndarray
+        Квадрат модуля градиента формы (H, W), dtype float32
+    """
+    gx = cv2.Sobel(gray_f32, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(gray_f32, cv2.CV_32F, 0, 1, ksize=3)
+    cv2.multiply(gx, gx, dst=gx)
+    cv2.multiply(gy, gy, dst=gy)
+    return cv2.add(gx, gy, dst=gx)
+
+
+def precompute_features(img_bgr: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Считает один раз на изображение признаки, общие для всех масок:
+    HSV, ExG и квадрат модуля градиента.
+    Маски (trunk_mask, foliage_mask_*, ground_*) принимают их готовыми,
+    вместо того чтобы каждая заново делала cvtColor/exg/Sobel по всему кадру.
+
+    Parameters
+    ----------
+    img_bgr : np.ndarray
+        Изображение в BGR, форма (H, W, 3)
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray]
+        (hsv uint8 (H, W, 3), exg float32 (H, W), gmag_sq float32 (H, W))
+    """
+    hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
+    gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY).astype(np.float32)
+    return hsv, exg(img_bgr), gradmag_sq(gray)
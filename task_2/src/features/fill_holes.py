@@ -12,9 +12,10 @@ def fill_holes(mask_u8: np.ndarray) -> np.ndarray:
     - заливка полостей делает область объекта более цельной.
 
     Метод:
-    - инвертируется маска
-    - flood fill от (0,0) по фону
-    - оставшееся после flood fill — это полости внутри объекта
+    - маска инвертируется и обводится рамкой фона в 1 пиксель
+    - flood fill от угла рамки: через рамку заливается весь внешний фон,
+      касающийся любого края кадра (а не только точки (0,0))
+    - незалитый фон — это полости внутри объекта
     - объединяется исходная маска с найденными полостями
 
     Parameters
@@ -29,16 +30,14 @@ def fill_holes(mask_u8: np.ndarray) -> np.ndarray:
         Маска uint8 формы (H, W), значения 0/255, с заполненными внутренними полостями.
     """
     m = (mask_u8 > 0).astype(np.uint8) * 255
-    inv = cv2.bitwise_not(m)
-    h, w = m.shape
 
-    ff = inv.copy()
-    flood_mask = np.zeros((h + 2, w + 2), np.uint8)
-    cv2.floodFill(ff, flood_mask, (0, 0), 0)
+    # Рамка уже даёт рабочую копию, отдельный inv.copy() и маска (H+2, W+2) не нужны.
+    ff = cv2.copyMakeBorder(m, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+    cv2.bitwise_not(ff, dst=ff)
+    cv2.floodFill(ff, None, (0, 0), 0)
 
-    holes = cv2.bitwise_not(ff)
-    filled = cv2.bitwise_or(m, holes)
-    return filled
+    # после заливки в ff остались 255 только в полостях
+    return cv2.bitwise_or(m, ff[1:-1, 1:-1])
 
 
 def remove_small(mask_u8: np.ndarray, min_area: int) -> np.ndarray:
@@ -62,9 +61,7 @@ def remove_small(mask_u8: np.ndarray, min_area: int) -> np.ndarray:
     m = (mask_u8 > 0).astype(np.uint8)
     num, labels, stats, _ = cv2.connectedComponentsWithStats(m, connectivity=8)
 
-    out = np.zeros_like(m)
-    for i in range(1, num):
-        if stats[i, cv2.CC_STAT_AREA] >= min_area:
-            out[labels == i] = 1
-
-    return (out * 255).astype(np.uint8)
+    # Таблица "метка -> 0/255": один проход по labels вместо прохода на каждую компоненту.
+    keep = np.where(stats[:, cv2.CC_STAT_AREA] >= min_area, 255, 0).astype(np.uint8)
+    keep[0] = 0  # фон
+    return keep[labels]
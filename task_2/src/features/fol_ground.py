@@ -1,100 +1,182 @@
 import cv2
 import numpy as np
-from src.features.exg_gradmag import exg, gradmag
+from src.features.exg_gradmag import exg, gradmag_sq
 from src.features.fill_holes import fill_holes, remove_small
-
-
-def foliage_mask_summer(img_bgr: np.ndarray, sky: np.ndarray, trunk_u8: np.ndarray) -> np.ndarray:
-    """Летняя листва (верх кадра), исключая землю и стволы."""
-    hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
+from src.features.pyramid import ellipse_kernel, scaled_area
+
+
+def foliage_mask_summer(
+    img_bgr: np.ndarray,
+    sky: np.ndarray,
+    trunk_u8: np.ndarray,
+    hsv: np.ndarray | None = None,
+    g: np.ndarray | None = None,
+    gmag_sq: np.ndarray | None = None,
+    scale: float = 1.0,
+) -> np.ndarray:
+    """
+    Летняя листва (верх кадра), исключая землю и стволы.
+    hsv, g (ExG), gmag_sq можно передать готовыми (см. precompute_features).
+    scale — масштаб img_bgr относительно исходного кадра (0.5 после pyrDown):
+    под него пересчитываются ядра морфологии и порог площади.
+    """
+    if hsv is None:
+        hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
     H, S, V = hsv[..., 0], hsv[..., 1], hsv[..., 2]
 
-    g = exg(img_bgr)
-    gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY).astype(np.float32)
-    gmag = gradmag(gray)
+    if g is None:
+        g = exg(img_bgr)
+    if gmag_sq is None:
+        gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY).astype(np.float32)
+        gmag_sq = gradmag_sq(gray)
 
+    # Предикаты считаются только по верхним строкам и накапливаются in-place (&=, |=),
+    # без отдельных булевых масок-промежуточных на весь кадр.
     h, w = img_bgr.shape[:2]
-    upper = np.zeros((h, w), dtype=bool)
-    upper[: int(0.72 * h), :] = True
-
-    green_h = (H >= 35) & (H <= 95)
-    veg = ((g > 30) & (S > 25) & (V > 30) & green_h) | (
-        (g > 45) & (S > 20) & (V > 25))
-    veg = veg & (gmag > 10) & upper & (~sky) & (~(trunk_u8 > 0))
-
-    m = (veg.astype(np.uint8) * 255)
-    m = cv2.morphologyEx(m, cv2.MORPH_CLOSE, cv2.getStructuringElement(
-        cv2.MORPH_ELLIPSE, (15, 15)), iterations=2)
-    m = cv2.morphologyEx(m, cv2.MORPH_OPEN, cv2.getStructuringElement(
-        cv2.MORPH_ELLIPSE, (5, 5)), iterations=1)
+    top = slice(0, int(0.72 * h))
+    H, S, V, g = H[top], S[top], V[top], g[top]
+
+    veg = (H >= 35) & (H <= 95)
+    veg &= g > 30
+    veg &= S > 25
+    veg &= V > 30
+    alt = g > 45
+    alt &= S > 20
+    alt &= V > 25
+    veg |= alt
+    veg &= gmag_sq[top] > 10 * 10
+    veg &= ~sky[top]
+    veg &= trunk_u8[top] == 0
+
+    m = np.zeros((h, w), dtype=np.uint8)
+    m[top][veg] = 255
+    m = cv2.morphologyEx(m, cv2.MORPH_CLOSE, ellipse_kernel(15, scale), iterations=2)
+    m = cv2.morphologyEx(m, cv2.MORPH_OPEN, ellipse_kernel(5, scale), iterations=1)
     m = fill_holes(m)
-    m = remove_small(m, min_area=4000)
+    m = remove_small(m, min_area=scaled_area(4000, scale))
     return m
 
 
-def foliage_mask_autumn(img_bgr: np.ndarray, sky: np.ndarray, trunk_u8: np.ndarray) -> np.ndarray:
-    """Осенняя листва (крона), исключая землю и стволы."""
-    hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
+def foliage_mask_autumn(
+    img_bgr: np.ndarray,
+    sky: np.ndarray,
+    trunk_u8: np.ndarray,
+    hsv: np.ndarray | None = None,
+    g: np.ndarray | None = None,
+    gmag_sq: np.ndarray | None = None,
+    scale: float = 1.0,
+) -> np.ndarray:
+    """
+    Осенняя листва (крона), исключая землю и стволы.
+    hsv, g (ExG), gmag_sq можно передать готовыми (см. precompute_features).
+    scale — масштаб img_bgr относительно исходного кадра (0.5 после pyrDown):
+    под него пересчитываются ядра морфологии и порог площади.
+    """
+    if hsv is None:
+        hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
     H, S, V = hsv[..., 0], hsv[..., 1], hsv[..., 2]
 
-    g = exg(img_bgr)
-    gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY).astype(np.float32)
-    gmag = gradmag(gray)
+    if g is None:
+        g = exg(img_bgr)
+    if gmag_sq is None:
+        gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY).astype(np.float32)
+        gmag_sq = gradmag_sq(gray)
 
     h, w = img_bgr.shape[:2]
-    upper = np.zeros((h, w), dtype=bool)
-    upper[: int(0.75 * h), :] = True
-
-    autumn = ((H <= 55) | (H >= 160)) & (S >= 55) & (V >= 45) & (g < 40)
-    autumn = autumn & upper & (~sky) & (~(trunk_u8 > 0)) & (gmag > 8)
-
-    m = (autumn.astype(np.uint8) * 255)
-    m = cv2.morphologyEx(m, cv2.MORPH_CLOSE, cv2.getStructuringElement(
-        cv2.MORPH_ELLIPSE, (17, 17)), iterations=2)
+    top = slice(0, int(0.75 * h))
+    H, S, V, g = H[top], S[top], V[top], g[top]
+
+    autumn = (H <= 55) | (H >= 160)
+    autumn &= S >= 55
+    autumn &= V >= 45
+    autumn &= g < 40
+    autumn &= ~sky[top]
+    autumn &= trunk_u8[top] == 0
+    autumn &= gmag_sq[top] > 8 * 8
+
+    m = np.zeros((h, w), dtype=np.uint8)
+    m[top][autumn] = 255
+    m = cv2.morphologyEx(m, cv2.MORPH_CLOSE, ellipse_kernel(17, scale), iterations=2)
     m = fill_holes(m)
-    m = remove_small(m, min_area=5000)
+    m = remove_small(m, min_area=scaled_area(5000, scale))
     return m
 
 
-def ground_warm_mask_autumn(img_bgr: np.ndarray, sky: np.ndarray, trunk_u8: np.ndarray) -> np.ndarray:
-    """Тёплая земля/ковёр листьев (нижняя часть) на осеннем фото."""
-    hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
+def ground_warm_mask_autumn(
+    img_bgr: np.ndarray,
+    sky: np.ndarray,
+    trunk_u8: np.ndarray,
+    hsv: np.ndarray | None = None,
+    g: np.ndarray | None = None,
+    scale: float = 1.0,
+) -> np.ndarray:
+    """
+    Тёплая земля/ковёр листьев (нижняя часть) на осеннем фото.
+    hsv, g (ExG) можно передать готовыми (см. precompute_features).
+    scale — масштаб img_bgr относительно исходного кадра (0.5 после pyrDown):
+    под него пересчитываются ядра морфологии и порог площади.
+    """
+    if hsv is None:
+        hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
     H, S, V = hsv[..., 0], hsv[..., 1], hsv[..., 2]
-    g = exg(img_bgr)
+    if g is None:
+        g = exg(img_bgr)
 
     h, w = img_bgr.shape[:2]
-    bottom = np.zeros((h, w), dtype=bool)
-    bottom[int(0.58 * h):, :] = True
-
-    warm = (H <= 45) & (S >= 40) & (V >= 35) & (g < 45)
-    m = warm & bottom & (~sky) & (~(trunk_u8 > 0))
-
-    mu8 = (m.astype(np.uint8) * 255)
-    mu8 = cv2.morphologyEx(mu8, cv2.MORPH_CLOSE, cv2.getStructuringElement(
-        cv2.MORPH_ELLIPSE, (21, 21)), iterations=2)
+    bottom = slice(int(0.58 * h), h)
+    H, S, V, g = H[bottom], S[bottom], V[bottom], g[bottom]
+
+    warm = H <= 45
+    warm &= S >= 40
+    warm &= V >= 35
+    warm &= g < 45
+    warm &= ~sky[bottom]
+    warm &= trunk_u8[bottom] == 0
+
+    mu8 = np.zeros((h, w), dtype=np.uint8)
+    mu8[bottom][warm] = 255
+    mu8 = cv2.morphologyEx(mu8, cv2.MORPH_CLOSE, ellipse_kernel(21, scale), iterations=2)
     mu8 = fill_holes(mu8)
-    mu8 = remove_small(mu8, min_area=6000)
+    mu8 = remove_small(mu8, min_area=scaled_area(6000, scale))
     return mu8
 
 
-def ground_grass_mask_summer(img_bgr: np.ndarray, sky: np.ndarray, trunk_u8: np.ndarray) -> np.ndarray:
-    """Зелёная трава (нижняя часть) на летнем фото."""
-    hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
+def ground_grass_mask_summer(
+    img_bgr: np.ndarray,
+    sky: np.ndarray,
+    trunk_u8: np.ndarray,
+    hsv: np.ndarray | None = None,
+    g: np.ndarray | None = None,
+    scale: float = 1.0,
+) -> np.ndarray:
+    """
+    Зелёная трава (нижняя часть) на летнем фото.
+    hsv, g (ExG) можно передать готовыми (см. precompute_features).
+    scale — масштаб img_bgr относительно исходного кадра (0.5 после pyrDown):
+    под него пересчитываются ядра морфологии и порог площади.
+    """
+    if hsv is None:
+        hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
     H, S, V = hsv[..., 0], hsv[..., 1], hsv[..., 2]
-    g = exg(img_bgr)
+    if g is None:
+        g = exg(img_bgr)
 
     h, w = img_bgr.shape[:2]
-    bottom = np.zeros((h, w), dtype=bool)
-    bottom[int(0.55 * h):, :] = True
-
-    grass = (g > 35) & (S > 20) & (V > 25) & (H >= 35) & (H <= 95)
-    m = grass & bottom & (~sky) & (~(trunk_u8 > 0))
-
-    mu8 = (m.astype(np.uint8) * 255)
-    mu8 = cv2.morphologyEx(mu8, cv2.MORPH_OPEN, cv2.getStructuringElement(
-        cv2.MORPH_ELLIPSE, (5, 5)), iterations=1)
-    mu8 = cv2.morphologyEx(mu8, cv2.MORPH_CLOSE, cv2.getStructuringElement(
-        cv2.MORPH_ELLIPSE, (25, 25)), iterations=2)
+    bottom = slice(int(0.55 * h), h)
+    H, S, V, g = H[bottom], S[bottom], V[bottom], g[bottom]
+
+    grass = g > 35
+    grass &= S > 20
+    grass &= V > 25
+    grass &= H >= 35
+    grass &= H <= 95
+    grass &= ~sky[bottom]
+    grass &= trunk_u8[bottom] == 0
+
+    mu8 = np.zeros((h, w), dtype=np.uint8)
+    mu8[bottom][grass] = 255
+    mu8 = cv2.morphologyEx(mu8, cv2.MORPH_OPEN, ellipse_kernel(5, scale), iterations=1)
+    mu8 = cv2.morphologyEx(mu8, cv2.MORPH_CLOSE, ellipse_kernel(25, scale), iterations=2)
     mu8 = fill_holes(mu8)
-    mu8 = remove_small(mu8, min_area=6000)
+    mu8 = remove_small(mu8, min_area=scaled_area(6000, scale))
     return mu8
@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+
+
+def scaled_ksize(k: int, scale: float) -> int:
+    """
+    Нечётный размер ядра морфологии для маски, построенной в масштабе scale
+    (0.5 — половинное разрешение): 15 -> 7, 25 -> 13, 5 -> 3.
+    """
+    if scale == 1.0:
+        return k
+    return max(1, int(k * scale) // 2 * 2 + 1)
+
+
+def ellipse_kernel(k: int, scale: float = 1.0) -> np.ndarray:
+    """Эллиптическое ядро k x k, пересчитанное под масштаб scale."""
+    ks = scaled_ksize(k, scale)
+    return cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (ks, ks))
+
+
+def scaled_area(area: int, scale: float) -> int:
+    """Порог площади компоненты (в пикселях) для маски в масштабе scale."""
+    return max(1, int(area * scale * scale))
+
+
+def upsample_mask(mask: np.ndarray, shape: tuple[int, ...]) -> np.ndarray:
+    """
+    Переносит маску половинного разрешения (bool или uint8 0/255) на полное
+    разрешение shape: pyrUp + порог 127, границы получаются гладкими, без «ступенек».
+    Тип результата совпадает с типом входа.
+    """
+    h, w = shape[:2]
+    m = mask.view(np.uint8) * np.uint8(255) if mask.dtype == bool else mask
+    up = cv2.pyrUp(m, dstsize=(w, h)) > 127
+    if mask.dtype == bool:
+        return up
+    return up.view(np.uint8) * np.uint8(255)
+
+
+def upsample_alpha(alpha: np.ndarray, shape: tuple[int, ...]) -> np.ndarray:
+    """
+    Переносит float32 альфу половинного разрешения на полное разрешение shape.
+    pyrUp сам интерполирует гауссовым ядром 5x5, отдельный blur не нужен.
+    """
+    h, w = shape[:2]
+    return cv2.pyrUp(alpha, dstsize=(w, h))
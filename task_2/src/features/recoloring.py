@@ -22,6 +22,13 @@ def circ_mean_h(h: np.ndarray) -> float:
     return a / (2.0 * np.pi) * 180.0
 
 
+def _src_hsv(src_bgr: np.ndarray, src_hsv: np.ndarray | None) -> np.ndarray:
+    """HSV перекрашиваемого изображения: копия готового (его меняют на месте) или cvtColor."""
+    if src_hsv is None:
+        return cv2.cvtColor(src_bgr, cv2.COLOR_BGR2HSV)
+    return src_hsv.copy()
+
+
 def recolor_hsv_region(
     src_bgr: np.ndarray,
     src_mask_u8: np.ndarray,
@@ -31,45 +38,55 @@ def recolor_hsv_region(
     sv_strength: float,
     clamp_s: tuple[int, int],
     clamp_v: tuple[int, int],
+    src_hsv: np.ndarray | None = None,
+    ref_hsv: np.ndarray | None = None,
 ) -> np.ndarray:
     """
     Перекраска области по маске:
     - Hue сдвигаем к среднему Hue референса и затем клипуем в target_h_range
     - S,V матчим по mean/std к референсу и смешиваем с исходными через sv_strength
+
+    Маски переводятся в плоские индексы один раз; пиксели области выбираются
+    одной выборкой (N, 3), обрабатываются в float32 и записываются обратно одной записью.
+
+    src_hsv / ref_hsv — готовые HSV-представления src_bgr / ref_bgr, если уже посчитаны
+    (src_hsv копируется: перекраска пишет в него на месте).
     """
-    src_hsv = cv2.cvtColor(src_bgr, cv2.COLOR_BGR2HSV).astype(np.float32)
-    ref_hsv = cv2.cvtColor(ref_bgr, cv2.COLOR_BGR2HSV).astype(np.float32)
+    src_hsv = _src_hsv(src_bgr, src_hsv)
+    if ref_hsv is None:
+        ref_hsv = cv2.cvtColor(ref_bgr, cv2.COLOR_BGR2HSV)
 
-    sm = (src_mask_u8 > 0)
-    rm = (ref_mask_u8 > 0)
-    if sm.sum() < 500 or rm.sum() < 500:
+    sm = np.flatnonzero(src_mask_u8 > 0)
+    rm = np.flatnonzero(ref_mask_u8 > 0)
+    if sm.size < 500 or rm.size < 500:
         return src_bgr.copy()
 
-    H, S, V = src_hsv[..., 0], src_hsv[..., 1], src_hsv[..., 2]
-    Hr, Sr, Vr = ref_hsv[..., 0], ref_hsv[..., 1], ref_hsv[..., 2]
+    src_flat = src_hsv.reshape(-1, 3)
+    px = src_flat[sm].astype(np.float32)
+    ref = ref_hsv.reshape(-1, 3)[rm].astype(np.float32)
+    H, S, V = px[:, 0], px[:, 1], px[:, 2]
 
-    h_src = H[sm].copy()
-    h_un = h_src.copy()
+    h_un = H.copy()
     h_un[h_un >= 160] -= 180.0  # разворот красных хвостов
 
     mu_src = float(h_un.mean())
-    mu_ref = float(circ_mean_h(Hr[rm]))
+    mu_ref = float(circ_mean_h(ref[:, 0]))
 
     h_new = h_un + (mu_ref - mu_src)
     lo, hi = target_h_range
     h_new = np.clip(h_new, lo, hi)
-    H[sm] = (h_new % 180.0)
+    H[:] = (h_new % 180.0)
 
-    S_new = match_mean_std(S[sm], Sr[rm])
-    V_new = match_mean_std(V[sm], Vr[rm])
+    S_new = match_mean_std(S, ref[:, 1])
+    V_new = match_mean_std(V, ref[:, 2])
 
-    S[sm] = np.clip((1.0 - sv_strength) * S[sm] +
-                    sv_strength * S_new, clamp_s[0], clamp_s[1])
-    V[sm] = np.clip((1.0 - sv_strength) * V[sm] +
-                    sv_strength * V_new, clamp_v[0], clamp_v[1])
+    S[:] = np.clip((1.0 - sv_strength) * S +
+                   sv_strength * S_new, clamp_s[0], clamp_s[1])
+    V[:] = np.clip((1.0 - sv_strength) * V +
+                   sv_strength * V_new, clamp_v[0], clamp_v[1])
 
-    out = cv2.cvtColor(np.clip(src_hsv, 0, 255).astype(
-        np.uint8), cv2.COLOR_HSV2BGR)
+    src_flat[sm] = np.clip(px, 0, 255).astype(np.uint8)
+    out = cv2.cvtColor(src_hsv, cv2.COLOR_HSV2BGR)
     return out
 
 
@@ -80,39 +97,48 @@ def map_green_to_autumn(
     ref_mask_u8: np.ndarray,
     out_range: tuple[float, float],
     sv_strength: float,
+    src_hsv: np.ndarray | None = None,
+    ref_hsv: np.ndarray | None = None,
 ) -> np.ndarray:
-    """Маппинг зелёных Hue (28..105) -> осенний диапазон (out_range) + матчинг S,V к осени."""
-    src_hsv = cv2.cvtColor(src_bgr, cv2.COLOR_BGR2HSV).astype(np.float32)
-    ref_hsv = cv2.cvtColor(ref_bgr, cv2.COLOR_BGR2HSV).astype(np.float32)
+    """
+    Маппинг зелёных Hue (28..105) -> осенний диапазон (out_range) + матчинг S,V к осени.
+    Пиксели области выбираются по плоским индексам маски один раз (как в recolor_hsv_region),
+    готовые src_hsv / ref_hsv принимаются так же.
+    """
+    src_hsv = _src_hsv(src_bgr, src_hsv)
+    if ref_hsv is None:
+        ref_hsv = cv2.cvtColor(ref_bgr, cv2.COLOR_BGR2HSV)
 
-    sm = (mask_u8 > 0)
-    rm = (ref_mask_u8 > 0)
-    if sm.sum() < 500 or rm.sum() < 500:
+    sm = np.flatnonzero(mask_u8 > 0)
+    rm = np.flatnonzero(ref_mask_u8 > 0)
+    if sm.size < 500 or rm.size < 500:
         return src_bgr.copy()
 
-    H, S, V = src_hsv[..., 0], src_hsv[..., 1], src_hsv[..., 2]
-    Hr, Sr, Vr = ref_hsv[..., 0], ref_hsv[..., 1], ref_hsv[..., 2]
+    src_flat = src_hsv.reshape(-1, 3)
+    px = src_flat[sm].astype(np.float32)
+    ref = ref_hsv.reshape(-1, 3)[rm].astype(np.float32)
+    H, S, V = px[:, 0], px[:, 1], px[:, 2]
 
-    Hm = H[sm]
-    in_green = (Hm >= 28) & (Hm <= 105)
+    in_green = (H >= 28) & (H <= 105)
+    Hg = H[in_green]
 
-    H_new = Hm.copy()
+    H_new = H.copy()
     lo, hi = out_range
-    H_new[in_green] = lo + (Hm[in_green] - 28.0) / (105.0 - 28.0) * (hi - lo)
+    H_new[in_green] = lo + (Hg - 28.0) / (105.0 - 28.0) * (hi - lo)
 
-    if in_green.sum() > 100:
-        H_new[in_green] += (Hm[in_green] - float(Hm[in_green].mean())) * 0.05
+    if Hg.size > 100:
+        H_new[in_green] += (Hg - float(Hg.mean())) * 0.05
 
-    H[sm] = np.clip(H_new, 0, 179)
+    H[:] = np.clip(H_new, 0, 179)
 
-    S_new = match_mean_std(S[sm], Sr[rm])
-    V_new = match_mean_std(V[sm], Vr[rm])
+    S_new = match_mean_std(S, ref[:, 1])
+    V_new = match_mean_std(V, ref[:, 2])
 
-    S[sm] = np.clip((1.0 - sv_strength) * S[sm] + sv_strength * S_new, 10, 255)
-    V[sm] = np.clip((1.0 - sv_strength) * V[sm] + sv_strength * V_new, 5, 250)
+    S[:] = np.clip((1.0 - sv_strength) * S + sv_strength * S_new, 10, 255)
+    V[:] = np.clip((1.0 - sv_strength) * V + sv_strength * V_new, 5, 250)
 
-    out = cv2.cvtColor(np.clip(src_hsv, 0, 255).astype(
-        np.uint8), cv2.COLOR_HSV2BGR)
+    src_flat[sm] = np.clip(px, 0, 255).astype(np.uint8)
+    out = cv2.cvtColor(src_hsv, cv2.COLOR_HSV2BGR)
     return out
 
 
@@ -133,7 +159,10 @@ def degreen_trunks(img_bgr: np.ndarray, trunk_u8: np.ndarray, warmth: float) ->
 
 
 def blend(base_bgr: np.ndarray, changed_bgr: np.ndarray, alpha: np.ndarray) -> np.ndarray:
-    """Смешивание исходных тонов с измененными"""
-    out = changed_bgr.astype(
-        np.float32) * alpha[..., None] + base_bgr.astype(np.float32) * (1.0 - alpha[..., None])
-    return np.clip(out, 0, 255).astype(np.uint8)
+    """
+    Смешивание исходных тонов с измененными.
+    cv2.blendLinear смешивает uint8 изображения по весам (H, W) напрямую,
+    без float32 копий H×W×3 и без трёхканальной альфы.
+    """
+    a = alpha.astype(np.float32, copy=False)
+    return cv2.blendLinear(changed_bgr, base_bgr, a, 1.0 - a)
@@ -2,7 +2,7 @@ import cv2
 import numpy as np
 
 
-def sky_mask(img_bgr: np.ndarray) -> np.ndarray:
+def sky_mask(img_bgr: np.ndarray, hsv: np.ndarray | None = None) -> np.ndarray:
     """
     Строит булеву маску неба/облаков для данного изображения.
 
@@ -20,6 +20,8 @@ def sky_mask(img_bgr: np.ndarray) -> np.ndarray:
     ----------
     img_bgr : np.ndarray
         Входное изображение в BGR (OpenCV), форма (H, W, 3).
+    hsv : np.ndarray, optional
+        Готовое HSV-представление img_bgr (всего кадра), если уже посчитано.
 
     Returns
     -------
@@ -28,13 +30,23 @@ def sky_mask(img_bgr: np.ndarray) -> np.ndarray:
         True  -> пиксель относится к небу/облакам
         False -> небо/облака отсутствуют
     """
-    hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
-    H, S, V = hsv[..., 0], hsv[..., 1], hsv[..., 2]
     h, w = img_bgr.shape[:2]
+    top = slice(0, int(0.60 * h))
+
+    # Ниже верхних 60% неба не бывает: HSV и предикаты считаются только по этим строкам.
+    if hsv is None:
+        hsv = cv2.cvtColor(img_bgr[top], cv2.COLOR_BGR2HSV)
+    else:
+        hsv = hsv[top]
+    H, S, V = hsv[..., 0], hsv[..., 1], hsv[..., 2]
 
-    top = np.zeros((h, w), dtype=bool)
-    top[: int(0.60 * h), :] = True
+    blue = (H >= 80) & (H <= 140)
+    blue &= V > 60
+    blue &= S > 25
+    clouds = V > 180
+    clouds &= S < 90
+    blue |= clouds
 
-    blue = top & (H >= 80) & (H <= 140) & (V > 60) & (S > 25)
-    clouds = top & (V > 180) & (S < 90)
-    return blue | clouds
+    sky = np.zeros((h, w), dtype=bool)
+    sky[top] = blue
+    return sky
@@ -1,10 +1,17 @@
 import cv2
 import numpy as np
-from .exg_gradmag import gradmag
+from .exg_gradmag import gradmag_sq
 from .fill_holes import fill_holes, remove_small
+from .pyramid import ellipse_kernel, scaled_area, scaled_ksize
 
 
-def trunk_mask(img_bgr: np.ndarray, sky: np.ndarray) -> np.ndarray:
+def trunk_mask(
+    img_bgr: np.ndarray,
+    sky: np.ndarray,
+    hsv: np.ndarray | None = None,
+    gmag_sq: np.ndarray | None = None,
+    scale: float = 1.0,
+) -> np.ndarray:
     """
     Строит маску стволов/веток (древесных частей), чтобы защитить их от перекраски листвы.
 
@@ -20,27 +27,40 @@ def trunk_mask(img_bgr: np.ndarray, sky: np.ndarray) -> np.ndarray:
     sky : np.ndarray
         Булева маска неба (H, W), True = небо.
         Небо исключается из кандидатов.
+    hsv : np.ndarray, optional
+        Готовое HSV-представление img_bgr (см. precompute_features).
+    gmag_sq : np.ndarray, optional
+        Готовый квадрат модуля градиента img_bgr (см. precompute_features).
+    scale : float, optional
+        Масштаб img_bgr относительно исходного кадра (0.5 после pyrDown);
+        под него пересчитываются ядра морфологии и порог площади.
 
     Returns
     -------
     np.ndarray
         Маска стволов uint8 (H, W) 0/255.
     """
-    hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
+    if hsv is None:
+        hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
     S, V = hsv[..., 1], hsv[..., 2]
 
-    gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY).astype(np.float32)
-    gmag = gradmag(gray)
+    if gmag_sq is None:
+        gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY).astype(np.float32)
+        gmag_sq = gradmag_sq(gray)
 
-    cand = (~sky) & (S < 80) & (V < 165) & (V > 20) & (gmag > 20)
-    m = (cand.astype(np.uint8) * 255)
+    cand = ~sky
+    cand &= S < 80
+    cand &= V < 165
+    cand &= V > 20
+    cand &= gmag_sq > 20 * 20
+    m = cand.view(np.uint8) * np.uint8(255)
 
-    vk = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 25))
+    vk = cv2.getStructuringElement(
+        cv2.MORPH_RECT, (scaled_ksize(3, scale), scaled_ksize(25, scale)))
     m = cv2.morphologyEx(m, cv2.MORPH_OPEN, vk, iterations=1)
-    m = cv2.dilate(m, cv2.getStructuringElement(
-        cv2.MORPH_ELLIPSE, (7, 7)), iterations=1)
+    m = cv2.dilate(m, ellipse_kernel(7, scale), iterations=1)
 
     m = fill_holes(m)
     m[sky] = 0
-    m = remove_small(m, min_area=1500)
+    m = remove_small(m, min_area=scaled_area(1500, scale))
     return m
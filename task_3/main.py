@@ -1,91 +1,146 @@
+import importlib.util
 import os
+import subprocess
 import pandas as pd
 
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
 
-from src.caesar import dec_addr, dec_email
-from src.scoring import best_k_by_addr, best_k_joint
+from src.scoring import score_row
 
 INPUT_PATH = "../data/task-3/Задание-3-данные.xlsx"
+PARALLEL_MIN_ROWS = 5000  # меньше строк — запуск пула процессов дороже самого подбора
+HASHCAT = "hashcat.exe"
+# Маски hashcat по порядку: сначала мобильные номера (8/7 + 9xx, по 10^9 вариантов),
+# затем полный перебор 11 цифр (10^11) — только для хешей, не найденных раньше.
+PHONE_MASKS = ("89" + "?d" * 9, "79" + "?d" * 9, "?d" * 11)
+# calamine (пакет python-calamine) читает xlsx на порядок быстрее openpyxl;
+# если он не установлен, pandas использует openpyxl по умолчанию.
+EXCEL_ENGINE = "calamine" if importlib.util.find_spec("python_calamine") else None
 
 
-def identify(hashes: List[str]) -> None:
+def _run_hashcat(hashes: List[str], mask: str) -> Dict[str, str]:
     """
-    Brute-force атака для деанонимизации телефонных номеров.
-
-    :param hashes: исходные хеши телефонных номеров
-    :type hashes: List[str] 
+    Один запуск hashcat (атака по маске) для списка SHA-1 хешей.
+
+    hashcat запускается напрямую, без оболочки; найденные пары «хеш:телефон»
+    читаются из его stdout, а не из файла результатов.
+
+    :param hashes: хеши телефонных номеров
+    :type hashes: List[str]
+    :param mask: маска hashcat, например "?d" * 11
+    :type mask: str
+    :return: словарь хеш -> телефон для найденных номеров
+    :rtype: Dict[str, str]
+    :raises subprocess.CalledProcessError: если hashcat завершился с ошибкой
     """
     with open('hashes.txt', 'w') as f:
         for hash in hashes:
             f.write(hash + "\n")
-    os.system(
-        "hashcat.exe -a 3 -m 100 -o output.txt hashes.txt ?d?d?d?d?d?d?d?d?d?d?d")
+    proc = subprocess.run(
+        [HASHCAT, "-a", "3", "-m", "100", "--quiet", "--potfile-disable",
+         "hashes.txt", mask],
+        capture_output=True, text=True)
+    # 0 — найдены все хеши, 1 — перебор исчерпан (часть могла не найтись)
+    if proc.returncode not in (0, 1):
+        raise subprocess.CalledProcessError(
+            proc.returncode, proc.args, proc.stdout, proc.stderr)
+
+    wanted = set(hashes)
+    hash_to_phone = {}
+    for line in proc.stdout.splitlines():
+        parts = line.strip().split(":")
+        if len(parts) == 2 and parts[0] in wanted:
+            hash_val, phone = parts
+            hash_to_phone[hash_val] = phone
+    return hash_to_phone
 
 
-def deanon_data(input_path: str = INPUT_PATH) -> pd.DataFrame:
+def identify(hashes: List[str]) -> Dict[str, str]:
+    """
+    Brute-force атака для деанонимизации телефонных номеров.
+
+    Маски из PHONE_MASKS перебираются по очереди, каждая — только для ещё
+    не найденных хешей, поэтому результат тот же, что у полного перебора 11 цифр,
+    а для мобильных номеров перебирается в 100 раз меньше вариантов.
+
+    :param hashes: исходные хеши телефонных номеров
+    :type hashes: List[str]
+    :return: словарь хеш -> телефон для найденных номеров
+    :rtype: Dict[str, str]
+    :raises subprocess.CalledProcessError: если hashcat завершился с ошибкой
+    """
+    hash_to_phone = {}
+    for mask in PHONE_MASKS:
+        left = [h for h in dict.fromkeys(hashes) if h not in hash_to_phone]
+        if not left:
+            break
+        hash_to_phone.update(_run_hashcat(left, mask))
+    return hash_to_phone
+
+
+def deanon_data(input_path: str = INPUT_PATH, workers: Optional[int] = None) -> pd.DataFrame:
     """
     Основная функция для выполнения
 
     :param input_path: путь для входного файла
     :type input_path: str
+    :param workers: число процессов для подбора ключей; None — по числу CPU,
+        если различных пар (email, адрес) не меньше PARALLEL_MIN_ROWS, иначе 1 (без пула)
+    :type workers: Optional[int]
     :return: датафрейм с деобезличенными данными и ключами шифрования
     :rtype: DataFrame
     """
-    raw = pd.read_excel(input_path)
+    raw = pd.read_excel(input_path, engine=EXCEL_ENGINE)
 
     raw.columns = ["_c0", "Телефон", "email", "Адрес"]
     raw = raw.iloc[1:].reset_index(drop=True)
-    df = raw[["Телефон", "email", "Адрес"]].copy()
-
-    addr_keys = []
-    addr_scores = []
-    for a in df["Адрес"].astype(str):
-        k, sc = best_k_by_addr(a)
-        addr_keys.append(k)
-        addr_scores.append(sc)
-
-    df_addr = df.copy()
-    df_addr["k_addr"] = addr_keys
-    df_addr["addr_score"] = addr_scores
-
-    keys = []
-    sum_scores = []
-    addr_part = []
-    email_part = []
-
-    for e, a in zip(df["email"].astype(str), df["Адрес"].astype(str)):
-        k, ssum, sa, se = best_k_joint(e, a)
-        keys.append(k)
-        sum_scores.append(ssum)
-        addr_part.append(sa)
-        email_part.append(se)
-
-    out = df.copy()
-    out["Ключ_шифрования"] = keys
-    out["email_деобезличен"] = [
-        dec_email(e, k) for e, k in zip(df["email"].astype(str), keys)]
-    out["Адрес_деобезличен"] = [
-        dec_addr(a, k) for a, k in zip(df["Адрес"].astype(str), keys)]
-    out["score_addr"] = addr_part
-    out["score_email"] = email_part
-    out["score_total"] = sum_scores
-
-    phones = df["Телефон"].astype(str).str.strip()
-
-    identify(phones.tolist())
-
-    with open("output.txt", "r") as f:
-        lines = f.readlines()
-    hash_to_phone = {}
-    for line in lines:
-        parts = line.strip().split(":")
-        if len(parts) == 2:
-            hash_val, phone = parts
-            hash_to_phone[hash_val] = phone
-
-    out['Телефон_деобезличен'] = out['Телефон'].astype(str).map(hash_to_phone)
-    return out
+    # Поля приводятся к строкам один раз; дальше используются готовые списки/столбцы.
+    df = raw[["Телефон", "email", "Адрес"]].astype(str)
+
+    emails = df["email"].tolist()
+    addrs = df["Адрес"].tolist()
+
+    # Повторяющиеся пары (email, адрес) подбираются один раз, результат
+    # раздаётся всем строкам с этой парой.
+    pairs = list(zip(emails, addrs))
+    uniq = list(dict.fromkeys(pairs))
+    u_emails = [e for e, _ in uniq]
+    u_addrs = [a for _, a in uniq]
+
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(uniq) >= PARALLEL_MIN_ROWS else 1
+
+    # Строки независимы: при большом датасете подбор ключей идёт в пуле процессов,
+    # куски по chunksize строк уменьшают накладные расходы на передачу задач.
+    if workers > 1:
+        chunksize = max(1, len(uniq) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(score_row, u_emails, u_addrs, chunksize=chunksize))
+    else:
+        results = list(map(score_row, u_emails, u_addrs))
+    by_pair = dict(zip(uniq, results))
+    rows = [by_pair[p] for p in pairs]
+
+    cols = list(zip(*rows)) or [()] * 8
+    (_, _, keys, sum_scores, addr_part, email_part,
+     email_plain, addr_plain) = map(list, cols)
+
+    hash_to_phone = identify(df["Телефон"].str.strip().tolist())
+
+    # Результат собирается одним конструктором из столбцов df и готовых списков, без df.copy().
+    return pd.DataFrame({
+        "Телефон": df["Телефон"],
+        "email": df["email"],
+        "Адрес": df["Адрес"],
+        "Ключ_шифрования": keys,
+        "email_деобезличен": email_plain,
+        "Адрес_деобезличен": addr_plain,
+        "score_addr": addr_part,
+        "score_email": email_part,
+        "score_total": sum_scores,
+        "Телефон_деобезличен": df["Телефон"].map(hash_to_phone),
+    })
 
 
 if __name__ == "__main__":